@@ -1,14 +1,31 @@
 import argparse
 from src.classes.vm import VM
 from src.classes.network import NET
+from src.classes.libvirt_backend import LibvirtBackend, LibvirtBackendError
 import json
+import tempfile
 
-from src.utils.utils import init_log, generate_devices_ifaces
+from src.utils.utils import init_log, generate_devices_ifaces, validate_apache_profile, generate_static_corpus
+from src.utils.boot_profile import console_log_name, parse_console_log, format_boot_report
+from src.utils.netstats import format_netstats_report
 
 
 # GLOBAL PARAMS
 MIN_SERVERS = 2
 MAX_SERVERS = 5
+MIN_LBS = 1
+MAX_LBS = 5
+
+
+def positive_float(value):
+    """
+    argparse type for options that must be a number greater than 0.
+    """
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"{value} must be greater than 0")
+    return number
+
 
 if __name__ == "__main__":
 
@@ -27,6 +44,17 @@ if __name__ == "__main__":
             raise ValueError("The number of servers must be at least 2")
         if number_of_servers > MAX_SERVERS:
             raise ValueError("The maximum number of servers to create is 5")
+        number_of_lbs = config.get("number_of_lbs", 1)
+        if number_of_lbs < MIN_LBS:
+            raise ValueError("The number of load balancers must be at least 1")
+        if number_of_lbs > MAX_LBS:
+            raise ValueError("The maximum number of load balancers to create is 5")
+        apache_profile = config.get("apache_profile", None)
+        if apache_profile is not None:
+            validate_apache_profile(apache_profile)
+        static_corpus = (apache_profile or {}).get("static_corpus", None)
+        libvirt_uri = config.get("libvirt_uri", None)
+        qos = config.get("qos", {})
 
     except FileNotFoundError:
         print(f"Error: The file {json_path} does not exist.")
@@ -36,13 +64,13 @@ if __name__ == "__main__":
         raise json.JSONDecodeError
 
     
-    DEVICES_IFACES = generate_devices_ifaces(number_of_servers)
+    DEVICES_IFACES = generate_devices_ifaces(number_of_servers, number_of_lbs)
 
     BRIDGES = ["LAN1", "LAN2"]
 
     NETWORK_MAP = {
         device: (
-            ['LAN1', 'LAN2'] if device == 'lb' else  # Special rule for "lb" (load balancer)
+            ['LAN1', 'LAN2'] if device.startswith('lb') else  # Special rule for "lb"/"lbN" (load balancers)
             ['LAN1'] if device.startswith('c') else  # "c" devices (hosts) on LAN1
             ['LAN2'] if device.startswith('s') else  # "s" devices (servers) on LAN2
             []
@@ -50,6 +78,13 @@ if __name__ == "__main__":
         for device in DEVICES_IFACES.keys()
     }
 
+    # LAN1 IPs of the load balancers, next hops for the host route to the scenario
+    LB_GATEWAYS = [
+        ifaces["eth0"]["ipv4"]
+        for device, ifaces in DEVICES_IFACES.items()
+        if device.startswith('lb')
+    ]
+
     # create log for main
     log = init_log("manage-p2", debug_mode)
     log.info("manage-p2 launched")
@@ -61,12 +96,22 @@ if __name__ == "__main__":
             devices=DEVICES_IFACES.keys(),
             bridges=BRIDGES,
             network_map=NETWORK_MAP,
-            debug_mode=debug_mode
+            debug_mode=debug_mode,
+            lb_gateways=LB_GATEWAYS,
+            qos=qos
     )
 
+    # one libvirt connection shared by every VM, falling back to virsh if it can't be opened
+    backend = None
+    if libvirt_uri:
+        try:
+            backend = LibvirtBackend(libvirt_uri, debug_mode)
+        except (ImportError, LibvirtBackendError) as e:
+            log.warning(f"libvirt backend not available, using virsh: {e}")
+
     # dict associates device name with device VM object / instantiate the VM object
     device_to_vm = {
-        device_name: VM(device_name, interfaces, debug_mode) 
+        device_name: VM(device_name, interfaces, debug_mode, backend) 
         for device_name, interfaces in DEVICES_IFACES.items()
     }
 
@@ -94,6 +139,25 @@ if __name__ == "__main__":
     # 'destroy' subcommand
     subparsers.add_parser("destroy", help="Destroy the virtual environment")
 
+    # 'reset' subcommand
+    subparsers.add_parser("reset", help="Stop the VMs and revert their disks to the post-create state")
+
+    # 'boot-profile' subcommand
+    boot_profile_parser = subparsers.add_parser(
+        "boot-profile", help="Show the boot timeline of each VM from its serial console log"
+    )
+    boot_profile_parser.add_argument(
+        "--top", type=int, default=10, help="Number of slowest units to show (default: 10)"
+    )
+
+    # 'netstats' subcommand
+    netstats_parser = subparsers.add_parser(
+        "netstats", help="Show the throughput and drop rates of each VM port on the bridges"
+    )
+    netstats_parser.add_argument(
+        "--interval", type=positive_float, default=5, help="Seconds between the two counter samples (default: 5)"
+    )
+
     # Parse arguments
     args = parser.parse_args()
 
@@ -102,11 +166,21 @@ if __name__ == "__main__":
         # copying and creating files
         net.create_environment()
 
-        # defining every device vm
-        for vm in device_to_vm.values():
-            vm.define_vm()
-            vm.configure_vm(DEVICES_IFACES)
-            log.info(f"VM '{vm.name}' configured correctly")
+        with tempfile.TemporaryDirectory() as corpus_temp_dir:
+            # the static corpus is the same on every server, so it's generated only once
+            corpus_dir = None
+            if static_corpus and static_corpus.get("files", 0) > 0:
+                corpus_dir = generate_static_corpus(static_corpus, corpus_temp_dir)
+
+            # defining every device vm
+            for vm in device_to_vm.values():
+                vm.define_vm()
+                vm.configure_vm(DEVICES_IFACES, apache_profile, corpus_dir)
+                log.info(f"VM '{vm.name}' configured correctly")
+
+        # freeze the configured disks so 'reset' can go back to this state
+        if not net.snapshot_disks():
+            log.warning("Some disks have no snapshot, 'reset' won't work until the environment is re-created")
 
     elif args.orden == "start":
         if args.vm_name:
@@ -116,11 +190,14 @@ if __name__ == "__main__":
                 vm_to_start.close_vm_console() # to prevent re-opening to the same vm / this might be better
                 vm_to_start.start_vm()
                 vm_to_start.show_console_vm()
+                # the ports exist once the vm is running
+                net.apply_qos([args.vm_name])
         else:
             for vm in device_to_vm.values():
                 vm.close_vm_console() # to prevent re-opening to the same vm / this might be better
                 vm.start_vm()
                 vm.show_console_vm()
+            net.apply_qos()
 
     elif args.orden == "stop":
         # if a vm name is passed as an argument, stop only that vm
@@ -139,6 +216,31 @@ if __name__ == "__main__":
                 vm.close_vm_console()
         
 
+    elif args.orden == "reset":
+        log.info("Resetting environment")
+
+        # force off every vm, the disks can't be reverted while in use
+        for vm in device_to_vm.values():
+            vm.destroy_vm()
+            vm.close_vm_console()
+
+        # discard the runtime changes of every disk
+        if net.revert_disks():
+            log.info("Environment reset, ready to start")
+
+    elif args.orden == "boot-profile":
+        # parse the serial console log of every device
+        profiles = {
+            device: parse_console_log(console_log_name(device))
+            for device in DEVICES_IFACES.keys()
+        }
+        print(format_boot_report(profiles, args.top))
+
+    elif args.orden == "netstats":
+        # sample the counters of every vm port twice and show the rates
+        port_rates = net.netstats(args.interval)
+        print(format_netstats_report(port_rates, args.interval))
+
     elif args.orden == "destroy":
         log.info("Destroying environment")
 
@@ -153,3 +255,6 @@ if __name__ == "__main__":
 
     else:
         log.info("unrecognized parameter")
+
+    if backend:
+        backend.close()
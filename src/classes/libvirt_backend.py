@@ -0,0 +1,114 @@
+from src.utils.utils import init_log
+
+# libvirt-python is optional, without it the VMs are managed with virsh
+try:
+    import libvirt
+except ImportError:
+    libvirt = None
+
+# Errors are reported through LibvirtBackendError, so libvirt must not print them to stderr
+if libvirt is not None:
+    libvirt.registerErrorHandler(lambda *_: None, None)
+
+
+class LibvirtBackendError(Exception):
+    """
+    Error raised by LibvirtBackend, carrying the failed operation, the domain
+    and the libvirt error code instead of a plain command output string.
+    """
+    def __init__(self, operation, domain, error):
+        self.operation = operation
+        self.domain = domain
+        self.code = error.get_error_code() if libvirt and isinstance(error, libvirt.libvirtError) else None
+        super().__init__(f"{operation} failed for '{domain}': {error}")
+
+
+class LibvirtBackend:
+    def __init__(self, uri, debug_mode):
+        """
+        Opens a single libvirt connection that is reused for every lifecycle call of the run.
+        Use uri="test:///default" to try it without a hypervisor.
+        """
+        if libvirt is None:
+            raise ImportError("libvirt-python is not installed")
+        self.uri = uri
+        self.log = init_log("Libvirt_Backend", debug_mode)
+        try:
+            self.conn = libvirt.open(uri)
+        except libvirt.libvirtError as e:
+            raise LibvirtBackendError("open", uri, e) from e
+        self.log.debug(f"Connection to '{uri}' opened")
+
+    def lookup(self, name):
+        """
+        Returns the libvirt domain with the given name.
+        """
+        try:
+            return self.conn.lookupByName(name)
+        except libvirt.libvirtError as e:
+            raise LibvirtBackendError("lookup", name, e) from e
+
+    def define(self, xml_string):
+        """
+        Defines a domain from its XML description and returns its name.
+        """
+        try:
+            return self.conn.defineXML(xml_string).name()
+        except libvirt.libvirtError as e:
+            raise LibvirtBackendError("define", "xml", e) from e
+
+    def start(self, name):
+        """
+        Starts a defined domain.
+        """
+        self._call("start", name, lambda domain: domain.create())
+
+    def shutdown(self, name):
+        """
+        Asks the guest of a domain to shut down.
+        """
+        self._call("shutdown", name, lambda domain: domain.shutdown())
+
+    def destroy(self, name):
+        """
+        Forces off a domain.
+        """
+        self._call("destroy", name, lambda domain: domain.destroy())
+
+    def undefine(self, name):
+        """
+        Removes the definition of a domain.
+        """
+        self._call("undefine", name, lambda domain: domain.undefine())
+
+    def is_running(self, name):
+        """
+        Checks if a domain is running (boolean). A domain that does not exist is not running.
+        """
+        try:
+            state, _ = self.conn.lookupByName(name).state()
+            return state == libvirt.VIR_DOMAIN_RUNNING
+        except libvirt.libvirtError as e:
+            if e.get_error_code() == libvirt.VIR_ERR_NO_DOMAIN:
+                return False
+            raise LibvirtBackendError("state", name, e) from e
+
+    def close(self):
+        """
+        Closes the libvirt connection.
+        """
+        try:
+            self.conn.close()
+            self.log.debug(f"Connection to '{self.uri}' closed")
+        except libvirt.libvirtError as e:
+            self.log.error(f"Error while closing the connection to '{self.uri}': {e}")
+
+    def _call(self, operation, name, action):
+        """
+        Looks up a domain and runs a lifecycle action on it, wrapping libvirt errors.
+        """
+        domain = self.lookup(name)
+        try:
+            action(domain)
+        except libvirt.libvirtError as e:
+            raise LibvirtBackendError(operation, name, e) from e
@@ -1,15 +1,30 @@
 from lxml import etree
 from src.utils.utils import init_log
+from src.utils.boot_profile import console_log_name, CONSOLE_LOG_SUFFIX
+from src.utils.netstats import parse_dump_ports, compute_port_rates
 import subprocess, os
 import copy
+import time
 
 class NET:
-    def __init__(self, qcow_base, xml_base, devices, bridges, network_map, debug_mode):
+    # Internal qcow2 snapshot taken after configuring the VMs, used by 'reset'
+    SNAPSHOT_NAME = "configured"
+    # Host value of net.ipv4.fib_multipath_hash_policy before the ECMP route, restored on clean-up
+    HASH_POLICY_FILE = "multipath-hash-policy.saved"
+
+    def __init__(self, qcow_base, xml_base, devices, bridges, network_map, debug_mode, lb_gateways=None,
+                 qos=None, command_runner=None):
         self.QCOW_BASE = qcow_base
         self.XML_BASE = xml_base
         self.DEVICES = devices
         self.BRIDGES = bridges
         self.NETWORK_MAP = network_map
+        # LAN1 IPs of the load balancers, used as next hops from the host
+        self.LB_GATEWAYS = lb_gateways or ["10.1.1.1"]
+        # Optional QoS settings per bridge, keyed by port, device or device prefix (see qos_settings)
+        self.QOS = qos or {}
+        # Runs the ovs-vsctl/ovs-ofctl commands, same signature as subprocess.run (replaceable by a stand-in)
+        self.run_command = command_runner or subprocess.run
         self.log = init_log("NET_Manager", debug_mode)
 
     def create_xml_files(self):
@@ -42,12 +57,65 @@ class NET:
 
         self.log.info("All QCOW2 files successfully created")
 
+    def snapshot_disks(self):
+        """
+        Takes an internal qcow2 snapshot of every device disk once it is configured,
+        so the scenario can later be reverted to this state without re-creating it.
+        """
+        snapshotted = True
+        for device in self.DEVICES:
+            try:
+                subprocess.run(
+                    ["sudo", "-u", os.getenv('USER'), "qemu-img", "snapshot", "-c", self.SNAPSHOT_NAME, f"{device}.qcow2"],
+                    capture_output=True,
+                    text=True,
+                    check=True
+                )
+                self.log.debug(f"Snapshot '{self.SNAPSHOT_NAME}' of {device}.qcow2 created.")
+            except subprocess.CalledProcessError as e:
+                snapshotted = False
+                self.log.error(f"Error while creating snapshot of {device}.qcow2: {e.stderr}")
+
+        if snapshotted:
+            self.log.info("All QCOW2 snapshots successfully created")
+        return snapshotted
+
+    def revert_disks(self):
+        """
+        Reverts every device disk to the post-configure snapshot, discarding the runtime changes.
+        The qemu-img processes are launched in parallel and then waited for.
+        """
+        processes = {
+            device: subprocess.Popen(
+                ["sudo", "-u", os.getenv('USER'), "qemu-img", "snapshot", "-a", self.SNAPSHOT_NAME, f"{device}.qcow2"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+            for device in self.DEVICES
+        }
+        reverted = True
+        for device, process in processes.items():
+            _, stderr = process.communicate()
+            if process.returncode != 0:
+                reverted = False
+                self.log.error(f"Error while reverting {device}.qcow2: {stderr.strip()}")
+            else:
+                self.log.debug(f"{device}.qcow2 reverted to snapshot '{self.SNAPSHOT_NAME}'.")
+
+        if reverted:
+            self.log.info("All QCOW2 files reverted to the post-configure state")
+        return reverted
+
     def destroy_files(self):
         """
         Deletes all XML and QCOW2 files in the current directory that 
-        do not match the base files specified in the configuration.
+        do not match the base files specified in the configuration, and the serial console logs.
         """
-        files = [f for f in os.listdir('.') if os.path.isfile(f) and (f.endswith('.xml') or f.endswith('.qcow2'))]
+        files = [
+            f for f in os.listdir('.')
+            if os.path.isfile(f) and (f.endswith('.xml') or f.endswith('.qcow2') or f.endswith(CONSOLE_LOG_SUFFIX))
+        ]
         for file in files:
             if file != self.XML_BASE and file != self.QCOW_BASE:
                 try:
@@ -56,13 +124,13 @@ class NET:
                 except Exception as e:
                     self.log.exception(f"Error while deleting {file}")
 
-        self.log.info("Clean-up completed: All XML and QCOW2 files except base files have been deleted.")
+        self.log.info("Clean-up completed: All XML, QCOW2 and console log files except base files have been deleted.")
 
 
     def xml_modifier(self, xml_name, network_list):
         """
         Modifies the XML file for the device to include correct VM configuration
-        like disk source, network interface, and other parameters.
+        like disk source, network interface, serial console log and other parameters.
         """
         try:
             tree = self.xml_finder(xml_name)
@@ -79,11 +147,13 @@ class NET:
 
             self.name_modifier(root, new_name)
             self.source_file_modifier(root, source_path)
+            self.console_log_modifier(root, os.path.abspath(console_log_name(new_name)))
             self.interface_lan_modifier(root, network_list[0])
 
             if len(network_list) > 1:
                 for net in network_list[1:]:
                     self.duplicate_interface(root, net)
+            self.interface_target_modifier(root, new_name)
 
             tree.write(xml_name, pretty_print=True, xml_declaration=True, encoding="UTF-8")
             self.log.debug(f"{xml_name} successfully modified.")
@@ -122,6 +192,20 @@ class NET:
         """
         root.find(".//devices/disk/source").set("file", new_source_path)
 
+    @staticmethod
+    def console_log_modifier(root, log_path):
+        """
+        Adds a log file to the serial console of the VM, overwritten on every boot,
+        so the boot output can be profiled afterwards.
+        """
+        serial = root.find(".//devices/serial")
+        log = serial.find("log")
+        if log is None:
+            log = etree.Element("log")
+            serial.insert(0, log)
+        log.set("file", log_path)
+        log.set("append", "off")
+
     @staticmethod
     def interface_lan_modifier(root, new_bridge):
         """
@@ -145,13 +229,163 @@ class NET:
             new_interface.find("source").set("bridge", bridge_name)
             root.find(".//devices").append(new_interface)
 
+    @staticmethod
+    def port_name(device, iface_index):
+        """
+        Returns the name of the OVS port (tap device) of the given VM interface.
+        """
+        return f"{device}-eth{iface_index}"
+
+    @staticmethod
+    def interface_target_modifier(root, device):
+        """
+        Names the tap device of every interface after the VM and its interface (e.g. s1-eth0),
+        so the OVS ports can be found for QoS and traffic accounting.
+        """
+        for index, interface in enumerate(root.findall(".//devices/interface")):
+            target = interface.find("target")
+            if target is None:
+                target = etree.SubElement(interface, "target")
+            target.set("dev", NET.port_name(device, index))
+
+    def device_ports(self, devices=None):
+        """
+        Returns (device, bridge, port) for every interface of the given devices (all by default),
+        following the device-to-bridge mapping of NETWORK_MAP.
+        """
+        return [
+            (device, bridge, self.port_name(device, index))
+            for device, bridges in self.NETWORK_MAP.items()
+            if devices is None or device in devices
+            for index, bridge in enumerate(bridges)
+        ]
+
+    def qos_settings(self, device, bridge, port):
+        """
+        Returns the QoS settings of a VM port, or None if the config doesn't target it.
+        Under each bridge, the settings are keyed by port name ({vm}-eth{n}), device name
+        or device name prefix (e.g. "s"), in that order of precedence (longest prefix first).
+        """
+        targets = self.QOS.get(bridge, {})
+        if port in targets:
+            return targets[port]
+        if device in targets:
+            return targets[device]
+        prefixes = sorted((key for key in targets if device.startswith(key)), key=len, reverse=True)
+        return targets[prefixes[0]] if prefixes else None
+
+    def apply_qos(self, devices=None):
+        """
+        Applies the configured QoS to the ports of the given devices (all by default).
+        Ingress policing limits the traffic sent by the VM (rates in kbps/kb), and an HTB queue
+        limits the traffic sent to the VM (rates in bps). The ports must exist, so the VMs must be running.
+        """
+        if not self.QOS:
+            return
+
+        for device, bridge, port in self.device_ports(devices):
+            settings = self.qos_settings(device, bridge, port)
+            if not settings:
+                continue
+            try:
+                if "ingress_policing_rate" in settings:
+                    self.run_command([
+                        'sudo', 'ovs-vsctl', 'set', 'interface', port,
+                        f"ingress_policing_rate={settings['ingress_policing_rate']}",
+                        f"ingress_policing_burst={settings.get('ingress_policing_burst', 0)}"
+                    ], check=True)
+
+                if "egress_max_rate" in settings:
+                    # records of a previous start of this port would be left behind
+                    self.remove_qos(port)
+                    tags = ['external-ids:manage-p2=true', f"external-ids:manage-p2-port={port}"]
+                    queue_config = [f"other-config:max-rate={settings['egress_max_rate']}"]
+                    if "egress_min_rate" in settings:
+                        queue_config.append(f"other-config:min-rate={settings['egress_min_rate']}")
+                    self.run_command([
+                        'sudo', 'ovs-vsctl',
+                        '--', 'set', 'port', port, 'qos=@qos',
+                        '--', '--id=@qos', 'create', 'qos', 'type=linux-htb',
+                        f"other-config:max-rate={settings['egress_max_rate']}",
+                        *tags, 'queues:0=@queue',
+                        '--', '--id=@queue', 'create', 'queue', *queue_config, *tags
+                    ], check=True)
+                self.log.debug(f"QoS applied to port {port} ({device} on {bridge})")
+            except subprocess.CalledProcessError as e:
+                self.log.error(f"Error applying QoS to port {port}: {e}")
+
+        self.log.info("QoS applied to the VM ports")
+
+    def remove_qos(self, port=None):
+        """
+        Destroys the QoS and queue records created by apply_qos for the given port (all by default).
+        OVS keeps them after the ports are removed. The port's reference is cleared first.
+        """
+        if port:
+            match = f"external_ids:manage-p2-port={port}"
+            try:
+                self.run_command(['sudo', 'ovs-vsctl', '--if-exists', 'clear', 'port', port, 'qos'], check=True)
+            except subprocess.CalledProcessError as e:
+                self.log.error(f"Error clearing the QoS of port {port}: {e}")
+        else:
+            match = "external_ids:manage-p2=true"
+
+        # QoS records reference the queues, so they're destroyed first
+        for table in ('qos', 'queue'):
+            try:
+                result = self.run_command(
+                    ['sudo', 'ovs-vsctl', '--bare', '--columns=_uuid', 'find', table, match],
+                    capture_output=True,
+                    text=True,
+                    check=True
+                )
+                for uuid in result.stdout.split():
+                    self.run_command(['sudo', 'ovs-vsctl', 'destroy', table, uuid], check=True)
+                self.log.debug(f"OVS {table} records removed ({match})")
+            except subprocess.CalledProcessError as e:
+                self.log.error(f"Error removing OVS {table} records: {e}")
+
+    def sample_port_counters(self, devices=None):
+        """
+        Reads the counters of every VM port with ovs-ofctl dump-ports.
+        Ports that can't be read (e.g. VM not running) are returned as None.
+        """
+        counters = {}
+        for device, bridge, port in self.device_ports(devices):
+            try:
+                result = self.run_command(
+                    ['sudo', 'ovs-ofctl', 'dump-ports', bridge, port],
+                    capture_output=True,
+                    text=True,
+                    check=True
+                )
+                counters[(device, bridge, port)] = parse_dump_ports(result.stdout)
+            except subprocess.CalledProcessError as e:
+                self.log.debug(f"Port {port} counters not available: {e}")
+                counters[(device, bridge, port)] = None
+        return counters
+
+    def netstats(self, interval, devices=None):
+        """
+        Samples the VM port counters twice, interval seconds apart, and returns the
+        throughput and drop rates of each port (None for ports that couldn't be read).
+        """
+        before = self.sample_port_counters(devices)
+        time.sleep(interval)
+        after = self.sample_port_counters(devices)
+        return {
+            port: compute_port_rates(before[port], after[port], interval)
+            if before[port] is not None and after[port] is not None else None
+            for port in before
+        }
+
     def create_bridges(self):
         """
         Creates the bridges defined in the 'bridges' attribute using ovs-vsctl.
         """
         for bridge in self.BRIDGES:
             try:
-                subprocess.run(['sudo', 'ovs-vsctl', 'add-br', bridge], check=True)
+                self.run_command(['sudo', 'ovs-vsctl', 'add-br', bridge], check=True)
                 self.log.info(f"Bridge {bridge} created successfully.")
             except subprocess.CalledProcessError as e:
                 self.log.error(f"Error creating bridge {bridge}: {e}")
@@ -162,7 +396,7 @@ class NET:
         """
         for bridge in self.BRIDGES:
             try:
-                subprocess.run(['sudo', 'ovs-vsctl', 'del-br', bridge], check=True)
+                self.run_command(['sudo', 'ovs-vsctl', 'del-br', bridge], check=True)
                 self.log.info(f"Bridge {bridge} deleted successfully.")
             except subprocess.CalledProcessError as e:
                 self.log.error(f"Error deleting bridge {bridge}: {e}")
@@ -170,16 +404,58 @@ class NET:
     def add_interface_to_host(self):
         """
         Adds interface LAN1 to the host with a fixed IP.
+        With several load balancers, the route to the scenario is an ECMP route
+        with one next hop per load balancer, hashed on L4 so flows are spread among them.
         """
         try:
             subprocess.run(['sudo', 'ifconfig', 'LAN1', 'up'], check=True)
             subprocess.run(['sudo', 'ifconfig', 'LAN1', '10.1.1.3/24'], check=True)
-            subprocess.run(['sudo', 'ip', 'route', 'add', '10.1.0.0/16', 'via', '10.1.1.1'], check=True)
+            if len(self.LB_GATEWAYS) > 1:
+                self.save_multipath_hash_policy()
+                subprocess.run(['sudo', 'sysctl', '-w', 'net.ipv4.fib_multipath_hash_policy=1'], check=True)
+                nexthops = []
+                for gateway in self.LB_GATEWAYS:
+                    nexthops += ['nexthop', 'via', gateway, 'weight', '1']
+                subprocess.run(['sudo', 'ip', 'route', 'add', '10.1.0.0/16'] + nexthops, check=True)
+            else:
+                subprocess.run(['sudo', 'ip', 'route', 'add', '10.1.0.0/16', 'via', self.LB_GATEWAYS[0]], check=True)
             self.log.info("LAN1 interface added to host")
         except subprocess.CalledProcessError as e:
                 self.log.error(f"Error adding interface to host: {e}")
 
 
+    def save_multipath_hash_policy(self):
+        """
+        Saves the host multipath hash policy to a file, unless it was already saved
+        by a previous create, so clean-up can restore the original value.
+        """
+        if os.path.exists(self.HASH_POLICY_FILE):
+            return
+        result = subprocess.run(
+            ['sysctl', '-n', 'net.ipv4.fib_multipath_hash_policy'],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        with open(self.HASH_POLICY_FILE, "w") as policy_file:
+            policy_file.write(result.stdout.strip())
+        self.log.debug(f"Host multipath hash policy {result.stdout.strip()} saved")
+
+    def restore_multipath_hash_policy(self):
+        """
+        Restores the host multipath hash policy saved before adding the ECMP route.
+        """
+        if not os.path.exists(self.HASH_POLICY_FILE):
+            return
+        with open(self.HASH_POLICY_FILE, "r") as policy_file:
+            policy = policy_file.read().strip()
+        try:
+            subprocess.run(['sudo', 'sysctl', '-w', f"net.ipv4.fib_multipath_hash_policy={policy}"], check=True)
+            os.remove(self.HASH_POLICY_FILE)
+            self.log.info(f"Host multipath hash policy restored to {policy}")
+        except subprocess.CalledProcessError as e:
+            self.log.error(f"Error restoring the host multipath hash policy: {e}")
+
     def create_environment(self):
         """
         Creates the virtual environment by generating base files for each VM, 
@@ -195,9 +471,12 @@ class NET:
     def clean_environment(self):
         """
         Cleans up the environment by deleting all generated files and removing the 
-        created bridges from the system.
+        created bridges (and their QoS records) from the system.
         """
         self.log.debug("Starting environment clean-up...")
         self.destroy_files()
         self.delete_bridges()
+        self.restore_multipath_hash_policy()
+        # always run, the records may come from a previous config with QoS
+        self.remove_qos()
         self.log.info("Environment clean-up completed.")
@@ -1,20 +1,52 @@
+from lxml import etree
 from src.utils.utils import init_log
+from src.utils.boot_profile import BOOT_PROFILE_SCRIPT
+from src.classes.libvirt_backend import LibvirtBackendError
 import subprocess, os
 import tempfile
 import textwrap
 
 
+# Apache MPM event sizing defaults, overridable from the "apache_profile" config section
+APACHE_THREADS_PER_CHILD = 25
+APACHE_CHILD_MEMORY_MIB = 24     # estimated resident memory of one child process
+APACHE_MEMORY_FRACTION = 0.75    # share of the VM memory available for apache children
+APACHE_CHILDREN_PER_CPU = 16
+
+# Bytes per memory unit accepted by libvirt in the domain XML
+LIBVIRT_MEMORY_UNITS = {
+    "b": 1, "bytes": 1,
+    "KB": 10**3, "k": 2**10, "KiB": 2**10,
+    "MB": 10**6, "M": 2**20, "MiB": 2**20,
+    "GB": 10**9, "G": 2**30, "GiB": 2**30,
+    "TB": 10**12, "T": 2**40, "TiB": 2**40,
+    "PB": 10**15, "P": 2**50, "PiB": 2**50,
+    "EB": 10**18, "E": 2**60, "EiB": 2**60,
+}
+
+
 class VM:
-    def __init__(self, name, ifaces, debug_mode):
+    def __init__(self, name, ifaces, debug_mode, backend=None):
         self.name = name
         self.ifaces = ifaces
         self.log = init_log("VM_Manager", debug_mode)
+        # LibvirtBackend shared by all the VMs; when None, virsh is used
+        self.backend = backend
 
 
     def define_vm(self):
         """
         Defines a virtual machine (VM) using the provided XML configuration file.
         """
+        if self.backend:
+            try:
+                with open(f"{self.name}.xml", "r") as xml_file:
+                    self.backend.define(xml_file.read())
+                self.log.debug(f"vm '{self.name}' defined")
+            except (OSError, LibvirtBackendError) as e:
+                self.log.error(f"error while defining {self.name}.xml: {e}")
+            return
+
         command = f"virsh define {self.name}.xml"
         try:
             subprocess.run(command.split(" "), check=True)
@@ -51,8 +83,10 @@ class VM:
             iface {iface} inet static
                 address {config["ipv4"]}
                 netmask {config["mask"]}
-                gateway {config["gateway"]}
             """)
+            # Aliases like the load balancers' shared VIP (lo:0) have no gateway
+            if "gateway" in config:
+                content += f"    gateway {config['gateway']}\n"
 
         self.copy_to_vm(file_content=f"{content}\n", file_name="interfaces", target_path="/etc/network/")
 
@@ -107,6 +141,27 @@ class VM:
         except Exception as ex:
             self.log.error(f"Unexpected error: {ex}")
 
+    def configure_boot_profile(self):
+        """
+        Copies the boot profiling script into the VM and runs it in background from /etc/rc.local,
+        so the boot milestones are dumped to the serial console once the boot has finished.
+        """
+        self.copy_to_vm(file_content=BOOT_PROFILE_SCRIPT, file_name="boot-profile.sh", target_path="/usr/local/bin/")
+        try:
+            # Command to edit the /etc/rc.local file in the VM
+            command = [
+            "sudo", "virt-edit", "-d", self.name, "/etc/rc.local",
+            "-e", "s|^exit 0|sh /usr/local/bin/boot-profile.sh &\nexit 0|"
+            ]
+
+            # Run the command
+            subprocess.run(command, check=True)
+            self.log.debug(f"Boot profiling configured succesfully on {self.name}:/etc/rc.local")
+        except subprocess.CalledProcessError as e:
+            self.log.error(f"Error while configuring /etc/rc.local on '{self.name}': {e}")
+        except Exception as ex:
+            self.log.error(f"Unexpected error: {ex}")
+
     def restart_haproxy(self):
         """
         Restarts the HAProxy service inside the VM by editing /etc/rc.local to include the restart command.
@@ -204,16 +259,120 @@ class VM:
             target_path="/etc/haproxy/"
         )
 
-    def configure_vm (self, devices_ifaces):
+    def get_domain_resources(self):
+        """
+        Reads the number of vCPUs and the memory (MiB) of the VM from its domain XML file.
+        """
+        root = etree.parse(f"{self.name}.xml").getroot()
+        vcpus = int(root.find(".//vcpu").text)
+        memory = root.find(".//memory")
+        unit = memory.get("unit", "KiB")
+        if unit not in LIBVIRT_MEMORY_UNITS:
+            raise ValueError(f"unknown memory unit '{unit}'")
+        memory_mib = int(memory.text) * LIBVIRT_MEMORY_UNITS[unit] // 2**20
+        return vcpus, memory_mib
+
+    @staticmethod
+    def generate_mpm_event_config(vcpus, memory_mib, apache_profile):
+        """
+        Generates the Apache MPM event configuration sized for the given VM resources.
+        The number of children is bounded both by the memory budget and by the vCPUs,
+        and the start and spare values are kept within the resulting limits.
+        """
+        threads_per_child = apache_profile.get("threads_per_child", APACHE_THREADS_PER_CHILD)
+        child_memory_mib = apache_profile.get("child_memory_mib", APACHE_CHILD_MEMORY_MIB)
+
+        children_by_memory = int(memory_mib * APACHE_MEMORY_FRACTION // child_memory_mib)
+        children_by_cpu = vcpus * APACHE_CHILDREN_PER_CPU
+        server_limit = max(2, min(children_by_memory, children_by_cpu))
+        max_request_workers = server_limit * threads_per_child
+
+        # at most half of the children are started upfront, leaving room to grow
+        start_servers = max(1, min(vcpus, server_limit // 2))
+        # Apache wants MaxSpareThreads >= MinSpareThreads + ThreadsPerChild, both below MaxRequestWorkers
+        max_spare_threads = min(threads_per_child * vcpus * 4, max_request_workers - 1)
+        min_spare_threads = max(1, min(threads_per_child * vcpus, max_spare_threads - threads_per_child))
+
+        return textwrap.dedent(f"""
+        # Generated by manage-p2 for {vcpus} vCPUs and {memory_mib} MiB
+        <IfModule mpm_event_module>
+            ServerLimit              {server_limit}
+            StartServers             {start_servers}
+            ThreadLimit              {max(64, threads_per_child)}
+            ThreadsPerChild          {threads_per_child}
+            MinSpareThreads          {min_spare_threads}
+            MaxSpareThreads          {max_spare_threads}
+            MaxRequestWorkers        {max_request_workers}
+            MaxConnectionsPerChild   0
+        </IfModule>
+        """).strip() + "\n"
+
+    @staticmethod
+    def generate_apache_performance_config(apache_profile):
+        """
+        Generates the Apache KeepAlive and static file serving settings.
+        """
+        return textwrap.dedent(f"""
+        # Generated by manage-p2
+        KeepAlive On
+        MaxKeepAliveRequests {apache_profile.get("max_keepalive_requests", 1000)}
+        KeepAliveTimeout {apache_profile.get("keepalive_timeout", 2)}
+        EnableSendfile On
+        EnableMMAP On
+        """).strip() + "\n"
+
+    def copy_static_corpus(self, corpus_dir):
+        """
+        Copies the static content corpus generated on the host (see generate_static_corpus)
+        into /var/www/html/static/ inside the VM.
+        """
+        try:
+            subprocess.run(
+                ["sudo", "virt-copy-in", "-d", self.name, corpus_dir, "/var/www/html/"],
+                check=True
+            )
+            self.log.debug(f"Static corpus copied succesfully to {self.name}:/var/www/html/static/")
+        except subprocess.CalledProcessError as e:
+            self.log.error(f"Error while copying the static corpus to '{self.name}': {e}")
+
+    def configure_apache_profile(self, apache_profile, corpus_dir=None):
+        """
+        Pushes the Apache performance profile (MPM event sizing derived from the
+        domain XML, KeepAlive and sendfile/mmap settings) and the static corpus, if any, to the VM.
+        """
+        try:
+            vcpus, memory_mib = self.get_domain_resources()
+        except Exception as ex:
+            self.log.error(f"Error while reading the resources of '{self.name}' from {self.name}.xml: {ex}")
+            return
+
+        self.copy_to_vm(
+            file_content=self.generate_mpm_event_config(vcpus, memory_mib, apache_profile),
+            file_name="mpm_event.conf",
+            target_path="/etc/apache2/mods-available/"
+        )
+        # conf-enabled is included after the defaults of apache2.conf, so these settings prevail
+        self.copy_to_vm(
+            file_content=self.generate_apache_performance_config(apache_profile),
+            file_name="zz-performance.conf",
+            target_path="/etc/apache2/conf-enabled/"
+        )
+
+        if corpus_dir:
+            self.copy_static_corpus(corpus_dir)
+
+    def configure_vm (self, devices_ifaces, apache_profile=None, corpus_dir=None):
         """
         Configures the VM by copying necessary files and settings (hostname, interfaces, etc.).
-        If it's a load balancer, it configures HAProxy; if it's a server, it configures Apache2.
+        If it's a load balancer (lb, lb1..lbK), it configures HAProxy; if it's a server, it configures Apache2,
+        tuned with the given apache_profile and serving the static corpus in corpus_dir when they're provided.
         """
         self.copy_hostname()
         self.copy_interfaces()
         self.edit_hosts()
-        # Enables load balancing on lb
-        if self.name == "lb": 
+        self.configure_boot_profile()
+        # Enables load balancing on every lb (devices with name starting with 'lb')
+        if self.name.startswith("lb"): 
             self.edit_load_balancer()
             self.edit_haproxy_conf(devices_ifaces)
             self.restart_haproxy()
@@ -222,6 +381,8 @@ class VM:
         if self.name.startswith("s"): 
             self.configure_rc_local("apache2")
             self.copy_index_html()
+            if apache_profile:
+                self.configure_apache_profile(apache_profile, corpus_dir)
 
     def copy_to_vm(self, file_content, file_name, target_path):
         """
@@ -253,8 +414,13 @@ class VM:
         """
         try:
             # Start the VM
-            subprocess.run(["sudo", "virsh", "start", self.name], check=True)
+            if self.backend:
+                self.backend.start(self.name)
+            else:
+                subprocess.run(["sudo", "virsh", "start", self.name], check=True)
             self.log.info(f"VM '{self.name}' started succesfully.")
+        except LibvirtBackendError as e:
+            self.log.error(f"error while starting VM '{self.name}': {e}")
         except subprocess.CalledProcessError as e:
             self.log.error(f"error while starting VM '{self.name}'")
         except Exception as ex:
@@ -280,8 +446,13 @@ class VM:
         if self.is_vm_running():
             try:
                 # Stop/shutdown the VM
-                subprocess.run(["sudo", "virsh", "shutdown", self.name], check=True)
+                if self.backend:
+                    self.backend.shutdown(self.name)
+                else:
+                    subprocess.run(["sudo", "virsh", "shutdown", self.name], check=True)
                 self.log.info(f"VM '{self.name}' stopped succesfully.")
+            except LibvirtBackendError as e:
+                self.log.error(f"error while stopping VM '{self.name}': {e}")
             except subprocess.CalledProcessError as e:
                 self.log.error(f"error while stopping VM '{self.name}'")
             except Exception as ex:
@@ -294,6 +465,13 @@ class VM:
         """
         Checks if the VM is running (boolean)
         """
+        if self.backend:
+            try:
+                return self.backend.is_running(self.name)
+            except LibvirtBackendError as e:
+                self.log.error(f"Error while verifying the state of the VM '{self.name}': {e}")
+                return False
+
         try:
             # Run virsh list --all to obtain the state of all the VMs
             result = subprocess.run(
@@ -322,8 +500,13 @@ class VM:
         if self.is_vm_running():
             try:
                 # destroy vm
-                subprocess.run(["sudo", "virsh", "destroy", self.name], check=True)
+                if self.backend:
+                    self.backend.destroy(self.name)
+                else:
+                    subprocess.run(["sudo", "virsh", "destroy", self.name], check=True)
                 self.log.debug(f"vm '{self.name}' destroyed")
+            except LibvirtBackendError as e:
+                self.log.error(f"error while destroying {self.name}: {e}")
             except subprocess.CalledProcessError as e:
                 self.log.error(f"error while running virsh destroy {self.name}")
             except Exception as ex:
@@ -337,8 +520,13 @@ class VM:
         """
         try:
             # undefine vm
-            subprocess.run(["sudo", "virsh", "undefine", self.name], check=True)
+            if self.backend:
+                self.backend.undefine(self.name)
+            else:
+                subprocess.run(["sudo", "virsh", "undefine", self.name], check=True)
             self.log.debug(f"vm '{self.name}' undefined")
+        except LibvirtBackendError as e:
+            self.log.error(f"error while undefining {self.name}: {e}")
         except subprocess.CalledProcessError as e:
             self.log.error(f"error while running virsh undefine {self.name}")
         except Exception as ex:
@@ -0,0 +1,176 @@
+import re
+import subprocess
+
+# Sufijo del fichero de log de la consola serie de cada VM (en el directorio actual)
+CONSOLE_LOG_SUFFIX = "-console.log"
+
+# Servicios cuyo arranque se marca como hito en el perfil
+PROFILED_SERVICES = ["apache2", "haproxy"]
+
+# Script que se copia a las VMs: espera a que termine el arranque y vuelca los hitos a la consola serie
+BOOT_PROFILE_SCRIPT = """#!/bin/sh
+# Generated by manage-p2: dumps the boot milestones to the serial console
+while [ "$(systemctl is-system-running)" = "starting" ]; do
+    sleep 1
+done
+{
+    echo "BOOT-PROFILE-BEGIN"
+    systemd-analyze time
+    for unit in %s; do
+        echo "BOOT-PROFILE-UNIT $unit $(systemctl show -p ActiveEnterTimestampMonotonic $unit)"
+    done
+    systemd-analyze blame
+    echo "BOOT-PROFILE-END"
+} > /dev/ttyS0 2>&1
+""" % " ".join(PROFILED_SERVICES)
+
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+DURATION_TOKEN = re.compile(r"(\d+(?:\.\d+)?)(h|min|ms|us|s)\b")
+STARTUP_PHASE = re.compile(r"((?:\d+(?:\.\d+)?(?:h|min|ms|us|s)\s*)+)\((\w+)\)")
+BLAME_LINE = re.compile(r"^\s*((?:\d+(?:\.\d+)?(?:h|min|ms|us|s)\s*)+)\s(\S+)$")
+UNIT_LINE = re.compile(r"^BOOT-PROFILE-UNIT (\S+) ActiveEnterTimestampMonotonic=(\d+)")
+KERNEL_LINE = re.compile(r"^\[\s*(\d+\.\d+)\]\s(.*)$")
+KERNEL_HANDOFF = ("Run /sbin/init", "Freeing unused kernel")
+
+UNIT_SECONDS = {"h": 3600, "min": 60, "s": 1, "ms": 0.001, "us": 0.000001}
+
+
+def console_log_name(device):
+    """
+    Devuelve el nombre del fichero de log de la consola serie de un dispositivo.
+    """
+    return f"{device}{CONSOLE_LOG_SUFFIX}"
+
+def parse_duration(text):
+    """
+    Convierte una duración en formato systemd (p. ej. "1min 2.345s", "120ms") a segundos.
+
+    Args:
+        text (str): Duración en formato systemd.
+
+    Returns:
+        float: Duración en segundos.
+    """
+    return sum(float(value) * UNIT_SECONDS[unit] for value, unit in DURATION_TOKEN.findall(text))
+
+def read_console_log(log_path):
+    """
+    Lee el log de la consola serie de una VM con sudo, ya que lo escribe libvirt
+    como root con permisos 0600.
+
+    Args:
+        log_path (str): Ruta al fichero de log de la consola.
+
+    Returns:
+        str: Contenido del log, o None si no se puede leer.
+    """
+    try:
+        result = subprocess.run(
+            ["sudo", "cat", log_path],
+            capture_output=True,
+            text=True,
+            errors="replace",
+            check=True
+        )
+        return result.stdout
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+def parse_console_log(log_path):
+    """
+    Lee el log de la consola serie de una VM y extrae los hitos del arranque.
+
+    Args:
+        log_path (str): Ruta al fichero de log de la consola.
+
+    Returns:
+        dict: Perfil devuelto por parse_console_output, o None si el log no se puede leer.
+    """
+    output = read_console_log(log_path)
+    if output is None:
+        return None
+    return parse_console_output(output)
+
+def parse_console_output(output):
+    """
+    Extrae los hitos del arranque de la salida de la consola serie de una VM.
+
+    Se usa el bloque BOOT-PROFILE volcado por BOOT_PROFILE_SCRIPT (systemd-analyze time,
+    instante en que cada servicio quedó activo y systemd-analyze blame). Si no existe,
+    se estima la duración del kernel a partir de las marcas de tiempo de printk.
+
+    Args:
+        output (str): Contenido del log de la consola.
+
+    Returns:
+        dict: Diccionario con "phases" (fase -> segundos), "services" (servicio -> segundos
+        desde el arranque) y "units" (unidad -> segundos).
+    """
+    lines = [ANSI_ESCAPE.sub("", line).replace("\r", "") for line in output.split("\n")]
+
+    profile = {"phases": {}, "services": {}, "units": {}}
+    in_block = False
+    for line in lines:
+        if line.startswith("BOOT-PROFILE-BEGIN"):
+            # Solo interesa el último arranque registrado
+            profile = {"phases": {}, "services": {}, "units": {}}
+            in_block = True
+            continue
+        if line.startswith("BOOT-PROFILE-END"):
+            in_block = False
+            continue
+
+        if not in_block:
+            kernel_match = KERNEL_LINE.match(line)
+            if kernel_match and kernel_match.group(2).startswith(KERNEL_HANDOFF):
+                profile["phases"].setdefault("kernel", float(kernel_match.group(1)))
+            continue
+
+        unit_match = UNIT_LINE.match(line)
+        if unit_match:
+            active_usec = int(unit_match.group(2))
+            if active_usec > 0:
+                profile["services"][unit_match.group(1)] = active_usec / 1000000
+        elif line.startswith("Startup finished in"):
+            for duration, phase in STARTUP_PHASE.findall(line):
+                profile["phases"][phase] = parse_duration(duration)
+            total = line.rsplit("=", 1)
+            if len(total) == 2:
+                profile["phases"]["total"] = parse_duration(total[1])
+        else:
+            blame_match = BLAME_LINE.match(line)
+            if blame_match:
+                profile["units"][blame_match.group(2)] = parse_duration(blame_match.group(1))
+
+    return profile
+
+def format_boot_report(profiles, top=10):
+    """
+    Genera el informe de arranque: la línea temporal de cada dispositivo y las
+    unidades más lentas de todo el escenario.
+
+    Args:
+        profiles (dict): Diccionario dispositivo -> perfil devuelto por parse_console_log.
+        top (int): Número de unidades más lentas a mostrar.
+
+    Returns:
+        str: Informe en texto plano.
+    """
+    lines = ["Boot timelines (seconds):"]
+    slowest = []
+    for device, profile in profiles.items():
+        if profile is None:
+            lines.append(f"  {device:<6} no console log found")
+            continue
+
+        timeline = [f"{phase}={seconds:.2f}" for phase, seconds in profile["phases"].items()]
+        timeline += [f"{service} up={seconds:.2f}" for service, seconds in profile["services"].items()]
+        lines.append(f"  {device:<6} " + (", ".join(timeline) if timeline else "no boot milestones found"))
+
+        slowest += [(seconds, device, unit) for unit, seconds in profile["units"].items()]
+
+    lines.append(f"Slowest units across the farm (top {top}):")
+    for seconds, device, unit in sorted(slowest, reverse=True)[:top]:
+        lines.append(f"  {seconds:8.3f}s  {device:<6} {unit}")
+
+    return "\n".join(lines)
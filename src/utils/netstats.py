@@ -0,0 +1,81 @@
+import re
+
+# Contadores de "ovs-ofctl dump-ports": "rx pkts=10, bytes=1200, drop=0, errs=0, ..."
+COUNTERS_LINE = re.compile(r"\b(rx|tx)[ \t]+((?:\w+=[\d?]+,?[ \t]*)+)")
+COUNTER = re.compile(r"(\w+)=(\d+)")
+
+
+def parse_dump_ports(output):
+    """
+    Extrae los contadores de un puerto de la salida de "ovs-ofctl dump-ports".
+
+    Los contadores se ven desde el switch: "rx" es el tráfico que envía la VM
+    y "tx" el que recibe.
+
+    Args:
+        output (str): Salida de "ovs-ofctl dump-ports BRIDGE PUERTO".
+
+    Returns:
+        dict: Diccionario con claves como "rx_pkts", "rx_bytes", "rx_drop", "tx_pkts"...
+        Los contadores no disponibles ("?") se omiten.
+    """
+    counters = {}
+    for direction, values in COUNTERS_LINE.findall(output):
+        for name, value in COUNTER.findall(values):
+            counters[f"{direction}_{name}"] = int(value)
+    return counters
+
+def compute_port_rates(before, after, interval):
+    """
+    Calcula el caudal y la tasa de descartes de un puerto entre dos muestras.
+
+    Args:
+        before (dict): Contadores de la primera muestra (parse_dump_ports).
+        after (dict): Contadores de la segunda muestra.
+        interval (float): Segundos entre las dos muestras.
+
+    Returns:
+        dict: Para "rx" y "tx": Mbit/s, paquetes/s, descartes/s y porcentaje de descartes.
+    """
+    rates = {}
+    for direction in ("rx", "tx"):
+        delta = {
+            counter: after.get(f"{direction}_{counter}", 0) - before.get(f"{direction}_{counter}", 0)
+            for counter in ("pkts", "bytes", "drop")
+        }
+        offered = delta["pkts"] + delta["drop"]
+        rates[direction] = {
+            "mbps": delta["bytes"] * 8 / interval / 1000000,
+            "pps": delta["pkts"] / interval,
+            "drops": delta["drop"] / interval,
+            "drop_pct": 100 * delta["drop"] / offered if offered else 0.0,
+        }
+    return rates
+
+def format_netstats_report(port_rates, interval):
+    """
+    Genera el informe de tráfico por puerto de VM.
+
+    Args:
+        port_rates (dict): Diccionario (dispositivo, bridge, puerto) -> compute_port_rates, o None
+        si el puerto no se pudo muestrear.
+        interval (float): Segundos entre las dos muestras.
+
+    Returns:
+        str: Informe en texto plano.
+    """
+    lines = [
+        f"Per-port traffic over {interval:g}s (rx: sent by the VM, tx: received by the VM):",
+        f"  {'device':<6} {'bridge':<6} {'port':<10} {'rx Mbit/s':>10} {'rx pps':>9} {'rx drop%':>8}"
+        f" {'tx Mbit/s':>10} {'tx pps':>9} {'tx drop%':>8}",
+    ]
+    for (device, bridge, port), rates in port_rates.items():
+        if rates is None:
+            lines.append(f"  {device:<6} {bridge:<6} {port:<10} not available")
+            continue
+        rx, tx = rates["rx"], rates["tx"]
+        lines.append(
+            f"  {device:<6} {bridge:<6} {port:<10} {rx['mbps']:>10.2f} {rx['pps']:>9.0f} {rx['drop_pct']:>8.2f}"
+            f" {tx['mbps']:>10.2f} {tx['pps']:>9.0f} {tx['drop_pct']:>8.2f}"
+        )
+    return "\n".join(lines)
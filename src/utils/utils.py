@@ -1,4 +1,8 @@
 import logging, sys
+import os, random
+
+# IP virtual compartida por los balanceadores cuando hay más de uno
+LB_VIP = "10.1.0.10"
 
 def init_log(log_name, show_debug=True):
     """
@@ -14,36 +18,67 @@ def init_log(log_name, show_debug=True):
     log.propagate = False  # No propagar a otros loggers padres
     return log
 
-def generate_devices_ifaces(number_of_servers: int):
+def generate_lb_names(number_of_lbs: int):
+    """
+    Genera los nombres de los balanceadores de carga.
+
+    Con un único balanceador se mantiene el nombre histórico "lb"; con varios
+    se nombran "lb1".."lbK".
+
+    Args:
+        number_of_lbs (int): Número de balanceadores de carga.
+
+    Returns:
+        list: Lista con los nombres de los balanceadores.
     """
-    Genera dinámicamente un diccionario de interfaces de red basado en el número de servidores especificado.
+    if number_of_lbs == 1:
+        return ["lb"]
+    return [f"lb{i}" for i in range(1, number_of_lbs + 1)]
+
+def generate_devices_ifaces(number_of_servers: int, number_of_lbs: int = 1):
+    """
+    Genera dinámicamente un diccionario de interfaces de red basado en el número de servidores
+    y de balanceadores de carga especificado.
+
+    El primer balanceador conserva las IPs 10.1.1.1 y 10.1.2.1 (gateways de LAN1 y LAN2).
+    Los balanceadores adicionales usan 10.1.1.1X en LAN1 y 10.1.2.X en LAN2, y todos
+    comparten la IP virtual LB_VIP en una interfaz loopback (activo-activo).
 
     Args:
         number_of_servers (int): Número de servidores que comienzan con "s".
+        number_of_lbs (int): Número de balanceadores de carga que comienzan con "lb".
 
     Returns:
         dict: Diccionario con la estructura de `DEVICES_IFACES`.
     """
-    devices_ifaces = {
-        'lb': {
+    devices_ifaces = {}
+
+    for i, lb_name in enumerate(generate_lb_names(number_of_lbs), start=1):
+        devices_ifaces[lb_name] = {
             "eth0": {
-                "ipv4": "10.1.1.1",
+                "ipv4": "10.1.1.1" if i == 1 else f"10.1.1.{10 + i}",
                 "mask": "255.255.255.0",
                 "gateway": "10.1.1.1"
             },
             "eth1": {
-                "ipv4": "10.1.2.1",
+                "ipv4": f"10.1.2.{i}",
                 "mask": "255.255.255.0",
                 "gateway": "10.1.2.1"
             },
-        },
-        'c1': {
-            "eth0": {
-                "ipv4": "10.1.1.2",
-                "mask": "255.255.255.0",
-                "gateway": "10.1.1.1"
+        }
+        # IP virtual compartida por todos los balanceadores (sin gateway)
+        if number_of_lbs > 1:
+            devices_ifaces[lb_name]["lo:0"] = {
+                "ipv4": LB_VIP,
+                "mask": "255.255.255.255"
             }
-        },
+
+    devices_ifaces['c1'] = {
+        "eth0": {
+            "ipv4": "10.1.1.2",
+            "mask": "255.255.255.0",
+            "gateway": "10.1.1.1"
+        }
     }
 
     # Base IP para los servidores "sX"
@@ -61,4 +96,85 @@ def generate_devices_ifaces(number_of_servers: int):
         }
         base_ip += 1
 
-    return devices_ifaces
\ No newline at end of file
+    return devices_ifaces
+
+def validate_apache_profile(apache_profile):
+    """
+    Valida la sección "apache_profile": los parámetros numéricos deben ser enteros positivos
+    y, si existe, la sección "static_corpus" debe tener el formato esperado.
+
+    Args:
+        apache_profile (dict): Sección "apache_profile" de la configuración.
+
+    Raises:
+        ValueError: Si la sección no tiene el formato esperado.
+    """
+    if not isinstance(apache_profile, dict):
+        raise ValueError("apache_profile must be an object")
+    for key in ("threads_per_child", "child_memory_mib", "max_keepalive_requests", "keepalive_timeout"):
+        value = apache_profile.get(key, 1)
+        if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise ValueError(f"apache_profile.{key} must be a positive integer")
+    if apache_profile.get("static_corpus") is not None:
+        validate_static_corpus(apache_profile["static_corpus"])
+
+def validate_static_corpus(corpus):
+    """
+    Valida la sección "static_corpus" del perfil de Apache.
+
+    Args:
+        corpus (dict): Sección con "files", "sizes_kb" (tamaño en KB -> peso) y "seed" opcional.
+
+    Raises:
+        ValueError: Si la sección no tiene el formato esperado.
+    """
+    if not isinstance(corpus, dict):
+        raise ValueError("static_corpus must be an object")
+    files = corpus.get("files", 0)
+    if not isinstance(files, int) or files < 0:
+        raise ValueError("static_corpus.files must be a non-negative integer")
+    if files == 0:
+        return
+
+    sizes_kb = corpus.get("sizes_kb")
+    if not isinstance(sizes_kb, dict) or not sizes_kb:
+        raise ValueError("static_corpus.sizes_kb must map sizes in KB to weights")
+    for size, weight in sizes_kb.items():
+        if not size.isdigit() or int(size) <= 0:
+            raise ValueError(f"static_corpus.sizes_kb: '{size}' is not a positive integer size in KB")
+        if not isinstance(weight, (int, float)) or weight < 0:
+            raise ValueError(f"static_corpus.sizes_kb: the weight of '{size}' must be a non-negative number")
+    if sum(sizes_kb.values()) <= 0:
+        raise ValueError("static_corpus.sizes_kb: at least one weight must be greater than 0")
+
+def generate_static_corpus(corpus, target_dir):
+    """
+    Genera en target_dir/static un corpus de contenido estático con la distribución de
+    tamaños configurada, y un fichero corpus.txt con sus URLs para los generadores de carga.
+    La misma semilla produce siempre el mismo corpus.
+
+    Args:
+        corpus (dict): Sección "static_corpus" ya validada con validate_static_corpus.
+        target_dir (str): Directorio donde crear el corpus.
+
+    Returns:
+        str: Ruta del directorio "static" generado.
+    """
+    sizes_kb = [int(size) for size in corpus["sizes_kb"].keys()]
+    weights = list(corpus["sizes_kb"].values())
+    rng = random.Random(corpus.get("seed", 0))
+    chosen_sizes = rng.choices(sizes_kb, weights=weights, k=corpus["files"])
+
+    corpus_dir = os.path.join(target_dir, "static")
+    os.mkdir(corpus_dir)
+    urls = []
+    for i, size_kb in enumerate(chosen_sizes):
+        file_name = f"file-{i:04d}-{size_kb}k.bin"
+        with open(os.path.join(corpus_dir, file_name), "wb") as corpus_file:
+            corpus_file.write(rng.randbytes(size_kb * 1024))
+        urls.append(f"/static/{file_name}")
+
+    with open(os.path.join(corpus_dir, "corpus.txt"), "w") as index_file:
+        index_file.write("\n".join(urls) + "\n")
+
+    return corpus_dir
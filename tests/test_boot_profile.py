@@ -0,0 +1,41 @@
+import subprocess
+
+import pytest
+
+from src.utils import boot_profile
+from src.utils.boot_profile import format_boot_report, parse_console_log, parse_console_output
+
+CONSOLE_OUTPUT = """\
+[    0.000000] Linux version 6.1.0
+[    1.912345] Freeing unused kernel image memory: 2000K\r
+BOOT-PROFILE-BEGIN
+Startup finished in 1.883s (kernel) + 1min 7.012s (userspace) = 1min 8.895s
+BOOT-PROFILE-UNIT apache2 ActiveEnterTimestampMonotonic=9123456
+BOOT-PROFILE-UNIT haproxy ActiveEnterTimestampMonotonic=0
+         5.123s networking.service
+1min 2.300s apt-daily.service
+BOOT-PROFILE-END
+"""
+
+
+def test_parse_console_output():
+    profile = parse_console_output(CONSOLE_OUTPUT)
+
+    assert profile["phases"] == pytest.approx({"kernel": 1.883, "userspace": 67.012, "total": 68.895})
+    assert profile["services"] == pytest.approx({"apache2": 9.123456})
+    assert profile["units"] == pytest.approx({"networking.service": 5.123, "apt-daily.service": 62.3})
+
+
+@pytest.mark.parametrize("error", [
+    subprocess.CalledProcessError(1, ["sudo", "cat"]),
+    PermissionError("sudo not allowed"),
+])
+def test_unreadable_console_log(monkeypatch, error):
+    def failing_run(*args, **kwargs):
+        raise error
+    monkeypatch.setattr(boot_profile.subprocess, "run", failing_run)
+
+    profile = parse_console_log("s1-console.log")
+
+    assert profile is None
+    assert "s1     no console log found" in format_boot_report({"s1": profile})
@@ -0,0 +1,39 @@
+import pytest
+
+libvirt = pytest.importorskip("libvirt")
+
+from src.classes.libvirt_backend import LibvirtBackend
+
+TEST_DOMAIN_XML = """
+<domain type='test'>
+  <name>manage-p2-check</name>
+  <memory>1048576</memory>
+  <os><type>hvm</type></os>
+</domain>
+"""
+
+
+@pytest.fixture
+def backend():
+    backend = LibvirtBackend("test:///default", False)
+    yield backend
+    backend.close()
+
+
+def test_domain_lifecycle(backend):
+    name = backend.define(TEST_DOMAIN_XML)
+    assert name == "manage-p2-check"
+    assert not backend.is_running(name)
+
+    backend.start(name)
+    assert backend.is_running(name)
+
+    backend.destroy(name)
+    assert not backend.is_running(name)
+
+    backend.undefine(name)
+    assert not backend.is_running(name)
+
+
+def test_missing_domain_is_not_running(backend):
+    assert backend.is_running("manage-p2-missing") is False
@@ -0,0 +1,132 @@
+import subprocess
+
+import pytest
+
+from src.classes import network
+from src.classes.network import NET
+
+NETWORK_MAP = {
+    "lb": ["LAN1", "LAN2"],
+    "c1": ["LAN1"],
+    "s1": ["LAN2"],
+    "s2": ["LAN2"],
+    "s3": ["LAN2"],
+}
+
+
+class FakeRunner:
+    """
+    Stand-in for subprocess.run: records the commands and returns canned outputs.
+    """
+    def __init__(self, outputs=None):
+        self.commands = []
+        self.outputs = outputs or {}
+
+    def __call__(self, command, **kwargs):
+        self.commands.append(command)
+        output = self.outputs.get(tuple(command), "")
+        if isinstance(output, list):
+            output = output.pop(0)
+        return subprocess.CompletedProcess(command, 0, stdout=output, stderr="")
+
+
+def make_net(runner, qos=None):
+    return NET(
+        qcow_base="base.qcow2",
+        xml_base="base.xml",
+        devices=NETWORK_MAP.keys(),
+        bridges=["LAN1", "LAN2"],
+        network_map=NETWORK_MAP,
+        debug_mode=False,
+        qos=qos,
+        command_runner=runner
+    )
+
+
+def commands_for(runner, port):
+    return [command for command in runner.commands if port in command]
+
+
+def test_apply_qos_by_prefix_device_and_port():
+    runner = FakeRunner()
+    net = make_net(runner, qos={"LAN2": {
+        "s": {"egress_max_rate": 100000000, "egress_min_rate": 10000000},
+        "s2": {"ingress_policing_rate": 20000, "ingress_policing_burst": 2000},
+        "s3-eth0": {"ingress_policing_rate": 30000},
+    }})
+
+    net.apply_qos()
+
+    # s1 falls back to the "s" prefix: old records are removed, then a QoS with one queue is created
+    s1_commands = commands_for(runner, "s1-eth0")
+    assert s1_commands[0] == ["sudo", "ovs-vsctl", "--if-exists", "clear", "port", "s1-eth0", "qos"]
+    create = s1_commands[-1]
+    assert create[:7] == ["sudo", "ovs-vsctl", "--", "set", "port", "s1-eth0", "qos=@qos"]
+    assert "type=linux-htb" in create
+    queue = create[create.index("queue"):]
+    assert "other-config:max-rate=100000000" in queue
+    assert "other-config:min-rate=10000000" in queue
+    assert "external-ids:manage-p2-port=s1-eth0" in queue
+
+    # the device key beats the prefix, the port key beats the device
+    assert commands_for(runner, "s2-eth0") == [[
+        "sudo", "ovs-vsctl", "set", "interface", "s2-eth0",
+        "ingress_policing_rate=20000", "ingress_policing_burst=2000"
+    ]]
+    assert commands_for(runner, "s3-eth0") == [[
+        "sudo", "ovs-vsctl", "set", "interface", "s3-eth0",
+        "ingress_policing_rate=30000", "ingress_policing_burst=0"
+    ]]
+
+
+def test_apply_qos_skips_ports_without_matching_key():
+    runner = FakeRunner()
+    net = make_net(runner, qos={"LAN2": {"s": {"ingress_policing_rate": 20000}}})
+
+    net.apply_qos()
+
+    # the lb port on LAN2 aggregates every backend, it must not get the per-server limit
+    assert commands_for(runner, "lb-eth1") == []
+    assert commands_for(runner, "lb-eth0") == []
+    assert commands_for(runner, "c1-eth0") == []
+
+
+def test_remove_qos_clears_port_before_destroying():
+    find_qos = ("sudo", "ovs-vsctl", "--bare", "--columns=_uuid", "find", "qos",
+                "external_ids:manage-p2-port=s1-eth0")
+    find_queue = find_qos[:5] + ("queue", find_qos[6])
+    runner = FakeRunner({find_qos: "qos-uuid\n", find_queue: "queue-uuid\n"})
+    net = make_net(runner)
+
+    net.remove_qos("s1-eth0")
+
+    assert runner.commands == [
+        ["sudo", "ovs-vsctl", "--if-exists", "clear", "port", "s1-eth0", "qos"],
+        list(find_qos),
+        ["sudo", "ovs-vsctl", "destroy", "qos", "qos-uuid"],
+        list(find_queue),
+        ["sudo", "ovs-vsctl", "destroy", "queue", "queue-uuid"],
+    ]
+
+
+def test_netstats(monkeypatch):
+    monkeypatch.setattr(network.time, "sleep", lambda seconds: None)
+    first = (
+        'OFPST_PORT reply (OF1.3) (xid=0x2): 1 ports\n'
+        '  port  "s1-eth0": rx pkts=1000, bytes=1000000, drop=?, errs=0, frame=?, over=?, crc=?\n'
+        '           tx pkts=2000, bytes=3000000, drop=10, errs=?, coll=?\n'
+        '           duration=12.5s\n'
+    )
+    second = (
+        'OFPST_PORT reply (OF1.3) (xid=0x2): 1 ports\n'
+        '  port  "s1-eth0": rx pkts=3000, bytes=3500000, drop=?, errs=0, frame=?, over=?, crc=?\n'
+        '           tx pkts=5960, bytes=8000000, drop=50, errs=?, coll=?\n'
+        '           duration=14.5s\n'
+    )
+    runner = FakeRunner({("sudo", "ovs-ofctl", "dump-ports", "LAN2", "s1-eth0"): [first, second]})
+    net = make_net(runner)
+
+    rates = net.netstats(2, devices=["s1"])[("s1", "LAN2", "s1-eth0")]
+
+    assert rates["rx"] == pytest.approx({"mbps": 10.0, "pps": 1000.0, "drops": 0.0, "drop_pct": 0.0})
+    assert rates["tx"] == pytest.approx({"mbps": 20.0, "pps": 1980.0, "drops": 20.0, "drop_pct": 1.0})
@@ -0,0 +1,66 @@
+import pytest
+
+from src.utils.utils import LB_VIP, generate_devices_ifaces, validate_apache_profile
+
+# Layout generated before the load balancer tier existed
+BASELINE_DEVICES_IFACES = {
+    'lb': {
+        "eth0": {"ipv4": "10.1.1.1", "mask": "255.255.255.0", "gateway": "10.1.1.1"},
+        "eth1": {"ipv4": "10.1.2.1", "mask": "255.255.255.0", "gateway": "10.1.2.1"},
+    },
+    'c1': {
+        "eth0": {"ipv4": "10.1.1.2", "mask": "255.255.255.0", "gateway": "10.1.1.1"},
+    },
+    's1': {
+        "eth0": {"ipv4": "10.1.2.11", "mask": "255.255.255.0", "gateway": "10.1.2.1"},
+    },
+    's2': {
+        "eth0": {"ipv4": "10.1.2.12", "mask": "255.255.255.0", "gateway": "10.1.2.1"},
+    },
+}
+
+
+def test_single_lb_matches_baseline():
+    assert generate_devices_ifaces(2) == BASELINE_DEVICES_IFACES
+    assert generate_devices_ifaces(2, 1) == BASELINE_DEVICES_IFACES
+
+
+def test_several_lbs():
+    devices_ifaces = generate_devices_ifaces(3, 3)
+
+    assert list(devices_ifaces) == ["lb1", "lb2", "lb3", "c1", "s1", "s2", "s3"]
+    assert devices_ifaces["lb1"]["eth0"]["ipv4"] == "10.1.1.1"
+    assert devices_ifaces["lb1"]["eth1"]["ipv4"] == "10.1.2.1"
+
+    # every real interface has its own IP, only the VIP is shared
+    ips = [
+        config["ipv4"]
+        for ifaces in devices_ifaces.values()
+        for iface, config in ifaces.items()
+        if iface != "lo:0"
+    ]
+    assert len(ips) == len(set(ips))
+    assert "10.1.1.3" not in ips  # host address on LAN1
+
+    for lb in ("lb1", "lb2", "lb3"):
+        assert devices_ifaces[lb]["lo:0"] == {"ipv4": LB_VIP, "mask": "255.255.255.255"}
+    for device in ("c1", "s1", "s2", "s3"):
+        assert "lo:0" not in devices_ifaces[device]
+
+
+def test_vip_only_with_several_lbs():
+    assert "lo:0" not in generate_devices_ifaces(2, 1)["lb"]
+
+
+def test_validate_apache_profile():
+    validate_apache_profile({"threads_per_child": 25, "static_corpus": {"files": 0}})
+
+    for profile in (
+        {"child_memory_mib": 0},
+        {"threads_per_child": "25"},
+        {"keepalive_timeout": 1.5},
+        {"max_keepalive_requests": True},
+        {"static_corpus": {"files": 3, "sizes_kb": {"0.5": 1}}},
+    ):
+        with pytest.raises(ValueError):
+            validate_apache_profile(profile)
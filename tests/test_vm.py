@@ -0,0 +1,51 @@
+from src.classes.vm import VM
+
+
+def copied_files(vm, monkeypatch):
+    """
+    Replaces copy_to_vm so the generated files are collected instead of copied to the VM.
+    """
+    files = {}
+    monkeypatch.setattr(
+        vm, "copy_to_vm",
+        lambda file_content, file_name, target_path: files.update({target_path + file_name: file_content})
+    )
+    return files
+
+
+def test_copy_interfaces_without_gateway(monkeypatch):
+    vm = VM("lb1", {
+        "eth0": {"ipv4": "10.1.1.1", "mask": "255.255.255.0", "gateway": "10.1.1.1"},
+        "lo:0": {"ipv4": "10.1.0.10", "mask": "255.255.255.255"},
+    }, False)
+    files = copied_files(vm, monkeypatch)
+
+    vm.copy_interfaces()
+
+    content = files["/etc/network/interfaces"]
+    eth0, vip = content.split("auto eth0")[1].split("auto lo:0")
+    assert "    gateway 10.1.1.1\n" in eth0
+    assert "iface lo:0 inet static\n    address 10.1.0.10\n    netmask 255.255.255.255\n" in vip
+    assert "gateway" not in vip
+
+
+def mpm_values(config):
+    """
+    Parses the directives of a generated mpm_event.conf into a dict of ints.
+    """
+    values = {}
+    for line in config.splitlines():
+        fields = line.split()
+        if len(fields) == 2 and fields[1].isdigit():
+            values[fields[0]] = int(fields[1])
+    return values
+
+
+def test_mpm_event_config_within_limits():
+    for vcpus, memory_mib in [(2, 1024), (16, 512), (16, 64), (1, 16384)]:
+        values = mpm_values(VM.generate_mpm_event_config(vcpus, memory_mib, {}))
+
+        assert values["MaxRequestWorkers"] == values["ServerLimit"] * values["ThreadsPerChild"]
+        assert values["StartServers"] < values["ServerLimit"]
+        assert values["MinSpareThreads"] + values["ThreadsPerChild"] <= values["MaxSpareThreads"]
+        assert values["MaxSpareThreads"] < values["MaxRequestWorkers"]